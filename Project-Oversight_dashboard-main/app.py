@@ -1,105 +1,117 @@
-from flask import Flask, jsonify, render_template, Response
+from flask import Flask, jsonify, render_template, Response, abort
+from flask_caching import Cache
+from markupsafe import Markup
 import sqlite3
 import pathlib
-import json
+import threading
+import os
+import orjson
 
 app = Flask(__name__)
-DB_NAME = "sap_project.db"
+# Resolved next to this file, so the app works whatever directory it is launched from
+DB_NAME = str(pathlib.Path(__file__).with_name("sap_project.db"))
+
+# The data only changes when a new weekly snapshot is generated, so a short-lived
+# cache of the rendered page saves re-running the queries on every hit
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+CACHE_TIMEOUT = 60  # seconds
+
+# --- Queries ---
+# Module-level constants so each query is defined once, away from the route logic.
+# Reuse of compiled statements comes from the per-thread connection below: sqlite3's
+# statement cache lives on the connection and matches on the SQL string's value
+
+# High-level project health, summed by the data generator's view over the status roll-up
+KPI_SQL = "SELECT * FROM dashboard_kpi"
+
+# Latest status per Workstream, pre-joined by the data generator together with
+# its approved Change Requests
+STATUS_SQL = """
+SELECT * FROM dashboard_status
+ORDER BY schedule_variance ASC
+"""
+
+# S-Curve history, one Workstream after another in date order. The top-level
+# ORDER BY guarantees the week order of each series, and it is served straight
+# from the covering idx_progress_ws_week index, so SQLite never has to sort
+HISTORY_SQL = """
+SELECT ws_id, actual_pct, planned_pct 
+FROM progress 
+ORDER BY ws_id, week_ending ASC
+"""
+
+# S-Curve X-Axis: DISTINCT walks the week_ending index in order. The ORDER BY is
+# kept at the top level, since SQLite doesn't promise to feed an aggregate such as
+# json_group_array() from a subquery in that subquery's order
+LABELS_SQL = """
+SELECT DISTINCT week_ending
+FROM progress
+ORDER BY week_ending ASC
+"""
 
 # --- Database Helper ---
+# Each worker thread keeps its connection open across requests, so connection
+# setup and the PRAGMAs below are paid once and SQLite's page cache stays warm
+_local = threading.local()
+
 def get_db_connection():
-    """Establishes a connection to the SQLite database."""
+    """Returns this thread's connection to the SQLite database, opening it on first use."""
+    conn = getattr(_local, 'conn', None)
+    # The generator deletes and recreates the file, so reconnect if it was replaced
+    try:
+        db_file_id = os.stat(DB_NAME).st_ino
+    except FileNotFoundError:
+        # Mid-regeneration (or never generated): keep serving the previous snapshot if
+        # this thread has one, rather than letting sqlite3 create an empty database
+        if conn is not None:
+            return conn
+        abort(503, description=f"Database '{DB_NAME}' not found; run data.generator.py to (re)build it.")
+    if conn is not None and _local.db_file_id == db_file_id:
+        return conn
+    if conn is not None:
+        conn.close()
+
     conn = sqlite3.connect(DB_NAME)
     # This allows us to access columns by name (e.g., row['owner']) instead of index
     conn.row_factory = sqlite3.Row 
+    # Read-side tuning: the generator leaves the DB in WAL mode so readers don't
+    # block on it, and memory-mapped I/O skips copying pages through the page cache
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    conn.execute("PRAGMA temp_store=MEMORY")
+    _local.conn = conn
+    _local.db_file_id = db_file_id
     return conn
 
+def to_json(obj):
+    """Serializes chart data to JSON that the template can drop straight into a <script> block."""
+    # orjson is much faster than the stdlib encoder, and Markup skips Jinja's escaping pass.
+    # Escaping '<' keeps a '</script>' inside the data from closing the tag early.
+    return Markup(orjson.dumps(obj).replace(b'<', b'\\u003c').decode())
+
 # --- The Controller Route ---
 @app.route('/')
+@cache.cached(timeout=CACHE_TIMEOUT)
 def dashboard():
     conn = get_db_connection()
     
     # ==========================================
     # 1. KPI CARDS (Top of Dashboard)
     # ==========================================
-    # We aggregate data to show high-level project health
-    kpi_query = """
-    SELECT 
-        SUM(budget_spent) as total_spend,
-        AVG(cpi) as avg_cpi,
-        (SELECT COUNT(*) FROM change_requests WHERE status = 'Approved') as active_risks
-    FROM progress
-    WHERE week_ending = (SELECT MAX(week_ending) FROM progress)
-    """
-    kpi_data = conn.execute(kpi_query).fetchone()
+    kpi_data = conn.execute(KPI_SQL).fetchone()
 
     # ==========================================
     # 2. MAIN TABLE (Project Status Grid)
     # ==========================================
-    # We JOIN Workstreams with Progress to get the "Latest Status"
-    # This serves the detailed project cards/table in the UI
-    status_query = """
-    SELECT 
-        w.ws_id, 
-        w.name, 
-        w.owner, 
-        p.actual_pct, 
-        p.planned_pct, 
-        p.schedule_variance, 
-        p.budget_spent,
-        p.cpi
-    FROM workstreams w
-    JOIN progress p ON w.ws_id = p.ws_id
-    WHERE p.week_ending = (SELECT MAX(week_ending) FROM progress)
-    ORDER BY p.schedule_variance ASC
-    """
-    projects = conn.execute(status_query).fetchall()
-
-    # ==========================================
-    # 3. LINE CHART DATA (S-Curve)
-    # ==========================================
-    # Chart.js needs lists of data. We fetch the full history here.
-    history_query = """
-    SELECT week_ending, ws_id, actual_pct, planned_pct 
-    FROM progress 
-    ORDER BY week_ending ASC
-    """
-    history_rows = conn.execute(history_query).fetchall()
-    
-    # Process into JSON structure for Chart.js
-    # We need a unique list of dates for the X-Axis
-    labels = sorted(list(set([row['week_ending'] for row in history_rows])))
-    
-    # We need to organize data by Workstream for the lines
-    chart_datasets = {}
-    for row in history_rows:
-        ws_id = row['ws_id']
-        if ws_id not in chart_datasets:
-            chart_datasets[ws_id] = {'actual': [], 'planned': []}
-        chart_datasets[ws_id]['actual'].append(row['actual_pct'])
-        chart_datasets[ws_id]['planned'].append(row['planned_pct'])
+    # This serves the detailed project cards/table in the UI (and the bubble chart below)
+    projects = conn.execute(STATUS_SQL).fetchall()
 
     # ==========================================
-    # 4. BUBBLE CHART DATA (Risk vs. Delay)
+    # 3. BUBBLE CHART DATA (Risk vs. Delay)
     # ==========================================
-    # We aggregate Change Requests (Count & Cost) and join with current Delay
-    bubble_query = """
-    SELECT 
-        w.name, 
-        COUNT(cr.cr_id) as cr_count, 
-        COALESCE(SUM(cr.cost_impact), 0) as total_cr_cost, 
-        p.schedule_variance
-    FROM workstreams w
-    LEFT JOIN change_requests cr ON w.ws_id = cr.ws_id AND cr.status = 'Approved'
-    JOIN progress p ON w.ws_id = p.ws_id
-    WHERE p.week_ending = (SELECT MAX(week_ending) FROM progress)
-    GROUP BY w.ws_id
-    """
-    bubble_rows = conn.execute(bubble_query).fetchall()
-    
+    # Change Request Count & Cost were already aggregated alongside the current Delay above
     # Format for Chart.js Bubble format: {x: 10, y: 20, r: 5}
     bubble_data = []
-    for row in bubble_rows:
+    for row in projects:
         bubble_data.append({
             'label': row['name'],
             'x': row['cr_count'],              # X-Axis: Volume of Changes
@@ -107,16 +119,39 @@ def dashboard():
             'r': row['total_cr_cost'] / 10000  # Radius: Cost Impact (scaled down to fit screen)
         })
 
-    conn.close()
-
     # Pass everything to the HTML template
     return render_template(
         'dashboard.html', 
         kpis=kpi_data,
         projects=projects,
-        chart_labels=json.dumps(labels),
-        chart_datasets=json.dumps(chart_datasets),
-        bubble_data=json.dumps(bubble_data)
+        bubble_data=to_json(bubble_data)
+    )
+
+# --- The Chart Data API ---
+@app.route('/api/charts')
+@cache.cached(timeout=CACHE_TIMEOUT)
+def charts():
+    conn = get_db_connection()
+
+    # ==========================================
+    # LINE CHART DATA (S-Curve)
+    # ==========================================
+    # The browser fetches this after the page has rendered, so the full-history
+    # query doesn't hold up the KPI cards and status table
+    # Chart.js needs lists of data: one series per Workstream plus the dates for the X-Axis
+    history_rows = conn.execute(HISTORY_SQL).fetchall()
+    labels = [row['week_ending'] for row in conn.execute(LABELS_SQL)]
+    
+    # We need to organize data by Workstream for the lines
+    chart_datasets = {}
+    for row in history_rows:
+        series = chart_datasets.setdefault(row['ws_id'], {'actual': [], 'planned': []})
+        series['actual'].append(row['actual_pct'])
+        series['planned'].append(row['planned_pct'])
+
+    return Response(
+        orjson.dumps({'labels': labels, 'datasets': chart_datasets}),
+        mimetype='application/json'
     )
 
 if __name__ == '__main__':
@@ -1,13 +1,54 @@
 import sqlite3
 import random
+import numpy as np
 from datetime import datetime, timedelta
 import os
+import pathlib
 
 # Configuration
-DB_NAME = 'sap_project.db'
+DB_NAME = str(pathlib.Path(__file__).with_name('sap_project.db'))  # next to app.py, which reads it
 NUM_WEEKS = 24  # 6 months of data
 START_DATE = datetime.now() - timedelta(weeks=NUM_WEEKS)
 
+# The Story: weekly (actual_lo, actual_hi, spend_lo, spend_hi) rate bounds per workstream,
+# plus (crs_lo, crs_hi) bounds on how many Change Requests it raises
+WS_PROFILES = {
+    'WS_002': (0.3, 0.8, 1.1, 1.5, 15, 25),    # The Failing Project (High Risk)
+    'WS_001': (0.95, 1.05, 0.9, 1.1, 0, 3),    # The Good Project (Low Risk)
+}
+DEFAULT_PROFILE = (0.8, 1.0, 0.9, 1.1, 3, 8)  # Average
+
+# Latest status per workstream with its approved Change Requests (status grid + bubble chart).
+# {ws_filter} lets the triggers rebuild just the one workstream whose inputs changed
+DASHBOARD_STATUS_SQL = '''
+SELECT 
+    w.ws_id, 
+    w.name, 
+    w.owner, 
+    p.actual_pct, 
+    p.planned_pct, 
+    p.schedule_variance, 
+    p.budget_spent,
+    p.cpi,
+    COUNT(cr.cr_id) as cr_count, 
+    COALESCE(SUM(cr.cost_impact), 0) as total_cr_cost
+FROM workstreams w
+JOIN progress_latest p ON w.ws_id = p.ws_id
+LEFT JOIN change_requests cr ON w.ws_id = cr.ws_id AND cr.status = 'Approved'
+{ws_filter}
+GROUP BY w.ws_id
+'''
+
+# Program-wide KPI cards: summed over the one-row-per-workstream roll-up above,
+# so they stay current without any upkeep of their own
+DASHBOARD_KPI_SQL = '''
+SELECT 
+    SUM(budget_spent) as total_spend,
+    AVG(cpi) as avg_cpi,
+    SUM(cr_count) as active_risks
+FROM dashboard_status
+'''
+
 def create_schema(cursor):
     # 1. Table: Workstreams (Metadata)
     cursor.execute('''
@@ -36,6 +77,14 @@ def create_schema(cursor):
     )
     ''')
 
+    # Covering indexes, so both access paths are answered without touching the table:
+    # the latest-week snapshot (every column) and each workstream's S-Curve history in date order
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_progress_cover 
+    ON progress(week_ending DESC, ws_id, actual_pct, planned_pct, schedule_variance, budget_spent, cpi)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_progress_ws_week ON progress(ws_id, week_ending, actual_pct, planned_pct)')
+
     # 3. Table: ChangeRequests (Risks)
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS change_requests (
@@ -49,6 +98,7 @@ def create_schema(cursor):
         FOREIGN KEY (ws_id) REFERENCES workstreams(ws_id)
     )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cr_ws_status ON change_requests(ws_id, status)')
 
 def generate_data(cursor):
     print("--- Generating SQL Data ---")
@@ -65,72 +115,65 @@ def generate_data(cursor):
     print("✔ Populated Workstreams")
 
     # --- 2. Progress Data ---
-    progress_records = []
-    
-    # Helper to access budget from the list above
-    ws_budget_map = {row[0]: row[3] for row in workstreams_data}
+    # Rows are streamed straight into executemany instead of being collected in a list first,
+    # so the full workstreams x NUM_WEEKS row list is never built; only one workstream's
+    # NUM_WEEKS-long arrays (plus the shared week labels) are held at a time
+    cursor.executemany('''
+        INSERT INTO progress (week_ending, ws_id, planned_pct, actual_pct, budget_spent, schedule_variance, cpi) 
+        VALUES (?,?,?,?,?,?,?)
+    ''', progress_rows(workstreams_data))
+    print("✔ Populated Progress Logs")
+
+    # --- 3. Change Requests Data ---
+    cursor.executemany('INSERT OR REPLACE INTO change_requests VALUES (?,?,?,?,?,?,?)', change_request_rows(workstreams_data))
+    print("✔ Populated Change Requests")
+
+def progress_rows(workstreams_data):
+    # One weekly progress row per workstream, generated lazily
+    # Shared timeline: the week labels and the Linear Plan are identical for every workstream
+    week_strs = [(START_DATE + timedelta(weeks=i)).strftime('%Y-%m-%d') for i in range(NUM_WEEKS)]
+    increment_plan = 100 / NUM_WEEKS
+    planned = np.minimum(100, np.cumsum(np.full(NUM_WEEKS, increment_plan)))
 
     for ws in workstreams_data:
         ws_id = ws[0]
         budget = ws[3]
+        budget_per_week = budget / NUM_WEEKS
         
-        current_planned = 0
-        current_actual = 0
-        current_spend = 0
-        
-        for i in range(NUM_WEEKS):
-            week_date = START_DATE + timedelta(weeks=i)
-            week_str = week_date.strftime('%Y-%m-%d')
-            
-            # Logic: Linear Plan
-            increment_plan = 100 / NUM_WEEKS
-            current_planned = min(100, current_planned + increment_plan)
-            
-            # Logic: Actuals (The Story)
-            if ws_id == 'WS_002': # The Failing Project
-                increment_actual = increment_plan * random.uniform(0.3, 0.8) 
-                spend_rate = (budget / NUM_WEEKS) * random.uniform(1.1, 1.5)
-            elif ws_id == 'WS_001': # The Good Project
-                increment_actual = increment_plan * random.uniform(0.95, 1.05)
-                spend_rate = (budget / NUM_WEEKS) * random.uniform(0.9, 1.1)
-            else: # Average
-                increment_actual = increment_plan * random.uniform(0.8, 1.0)
-                spend_rate = (budget / NUM_WEEKS) * random.uniform(0.9, 1.1)
-
-            current_actual = min(100, current_actual + increment_actual)
-            current_spend += spend_rate
-            
-            # Metrics
-            variance = round(current_actual - current_planned, 2)
-            cpi = round((current_actual/100 * budget) / (current_spend + 1), 2)
+        # Logic: Actuals (The Story) - one random rate per week, drawn up front
+        actual_lo, actual_hi, spend_lo, spend_hi, _, _ = WS_PROFILES.get(ws_id, DEFAULT_PROFILE)
+        actual_rates = np.random.uniform(actual_lo, actual_hi, NUM_WEEKS)
+        spend_rates = np.random.uniform(spend_lo, spend_hi, NUM_WEEKS)
 
-            progress_records.append((
-                week_str, ws_id, round(current_planned, 2), 
-                round(current_actual, 2), round(current_spend, 2), 
-                variance, cpi
-            ))
+        # Running totals: increments are always positive, so capping the cumulative sum
+        # matches capping week by week
+        actual = np.minimum(100, np.cumsum(increment_plan * actual_rates))
+        spend = np.cumsum(budget_per_week * spend_rates)
+        
+        # Metrics
+        variance = np.round(actual - planned, 2)
+        cpi = np.round((actual/100 * budget) / (spend + 1), 2)
 
-    cursor.executemany('''
-        INSERT INTO progress (week_ending, ws_id, planned_pct, actual_pct, budget_spent, schedule_variance, cpi) 
-        VALUES (?,?,?,?,?,?,?)
-    ''', progress_records)
-    print("✔ Populated Progress Logs")
+        yield from zip(
+            week_strs, [ws_id] * NUM_WEEKS, np.round(planned, 2).tolist(), 
+            np.round(actual, 2).tolist(), np.round(spend, 2).tolist(), 
+            variance.tolist(), cpi.tolist()
+        )
 
-    # --- 3. Change Requests Data ---
-    cr_records = []
+def change_request_rows(workstreams_data):
+    # The Change Requests raised against each workstream, generated lazily
     cr_counter = 1000
 
     for ws in workstreams_data:
         ws_id = ws[0]
         
         # Logic: Correlate CRs to Failure
-        if ws_id == 'WS_002': num_crs = random.randint(15, 25) # High Risk
-        elif ws_id == 'WS_001': num_crs = random.randint(0, 3) # Low Risk
-        else: num_crs = random.randint(3, 8)
+        _, _, _, _, crs_lo, crs_hi = WS_PROFILES.get(ws_id, DEFAULT_PROFILE)
+        num_crs = random.randint(crs_lo, crs_hi)
             
         for _ in range(num_crs):
             cr_date = START_DATE + timedelta(days=random.randint(0, NUM_WEEKS*7))
-            cr_records.append((
+            yield (
                 f"CR_{cr_counter}",
                 ws_id,
                 cr_date.strftime('%Y-%m-%d'),
@@ -138,24 +181,110 @@ def generate_data(cursor):
                 random.choice(['Approved', 'Approved', 'Rejected', 'Pending']),
                 random.randint(5000, 50000),
                 random.randint(1, 10)
-            ))
+            )
             cr_counter += 1
 
-    cursor.executemany('INSERT OR REPLACE INTO change_requests VALUES (?,?,?,?,?,?,?)', cr_records)
-    print("✔ Populated Change Requests")
+def create_trigger(cursor, name, spec, body):
+    cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    cursor.execute(f'CREATE TRIGGER {name} {spec} BEGIN {body} END')
+
+def build_rollups(cursor):
+    # Materialize the latest weekly snapshot so the dashboard doesn't have to
+    # resolve MAX(week_ending) on every page load
+    latest_sql = 'SELECT * FROM progress WHERE week_ending = (SELECT MAX(week_ending) FROM progress)'
+    cursor.execute('DROP TABLE IF EXISTS progress_latest')
+    cursor.execute(f'CREATE TABLE progress_latest AS {latest_sql}')
+    cursor.execute('CREATE INDEX idx_progress_latest_id ON progress_latest(id)')
+    cursor.execute('CREATE INDEX idx_progress_latest_ws ON progress_latest(ws_id)')
+
+    # Keep it current when progress changes after the initial load. SQLite triggers fire
+    # once per row, so each one is guarded to rows in the latest week and touches only
+    # that row; a full rebuild happens only when the latest week itself moves
+    in_latest = 'EXISTS (SELECT 1 FROM progress_latest WHERE id = OLD.id)'
+    reaches_latest = 'NEW.week_ending >= (SELECT MAX(week_ending) FROM progress)'
+    # A newer week replaces the snapshot, a re-submitted row replaces its own
+    create_trigger(cursor, 'progress_latest_on_insert', f'AFTER INSERT ON progress WHEN {reaches_latest}', """
+        DELETE FROM progress_latest WHERE week_ending < NEW.week_ending OR ws_id = NEW.ws_id;
+        INSERT INTO progress_latest SELECT * FROM progress WHERE id = NEW.id;
+    """)
+    # Edits within the latest week just swap the row
+    create_trigger(cursor, 'progress_latest_on_update',
+                   f'AFTER UPDATE ON progress WHEN NEW.week_ending IS OLD.week_ending AND {in_latest}', """
+        DELETE FROM progress_latest WHERE id = OLD.id;
+        INSERT INTO progress_latest SELECT * FROM progress WHERE id = NEW.id;
+    """)
+    # Moving a row into or out of the latest week can change which week is latest
+    create_trigger(cursor, 'progress_latest_on_week_change',
+                   f'AFTER UPDATE OF week_ending ON progress '
+                   f'WHEN NEW.week_ending IS NOT OLD.week_ending AND ({in_latest} OR {reaches_latest})', f"""
+        DELETE FROM progress_latest;
+        INSERT INTO progress_latest {latest_sql};
+    """)
+    # Deleting the last row of the latest week falls back to the previous week
+    create_trigger(cursor, 'progress_latest_on_delete', f'AFTER DELETE ON progress WHEN {in_latest}', f"""
+        DELETE FROM progress_latest WHERE id = OLD.id;
+        INSERT INTO progress_latest {latest_sql} AND NOT EXISTS (SELECT 1 FROM progress_latest);
+    """)
+    print("✔ Built Latest Snapshot")
+
+    # Pre-aggregate everything the dashboard shows, so a page load is a plain SELECT
+    cursor.execute('DROP TABLE IF EXISTS dashboard_status')
+    cursor.execute(f'CREATE TABLE dashboard_status AS {DASHBOARD_STATUS_SQL.format(ws_filter="")}')
+    cursor.execute('CREATE INDEX idx_dashboard_status_ws ON dashboard_status(ws_id)')
+    cursor.execute('DROP VIEW IF EXISTS dashboard_kpi')
+    cursor.execute(f'CREATE VIEW dashboard_kpi AS {DASHBOARD_KPI_SQL}')
+
+    # Workstream and snapshot changes rebuild only the affected workstream's row
+    def refresh_status(ref):
+        return (f'DELETE FROM dashboard_status WHERE ws_id = {ref}.ws_id; '
+                f'INSERT INTO dashboard_status '
+                f'{DASHBOARD_STATUS_SQL.format(ws_filter=f"WHERE w.ws_id = {ref}.ws_id")};')
+    for source, event, refs in [('progress_latest', 'INSERT', ['NEW']), ('progress_latest', 'DELETE', ['OLD']),
+                                ('workstreams', 'INSERT', ['NEW']), ('workstreams', 'DELETE', ['OLD']),
+                                ('workstreams', 'UPDATE', ['OLD', 'NEW'])]:
+        create_trigger(cursor, f'dashboard_status_on_{source}_{event.lower()}', f'AFTER {event} ON {source}',
+                       ''.join(refresh_status(ref) for ref in refs))
+
+    # Approved Change Requests just adjust their workstream's running count and cost
+    def count_cr(ref, sign):
+        return (f"UPDATE dashboard_status SET cr_count = cr_count {sign} 1, "
+                f"total_cr_cost = total_cr_cost {sign} COALESCE({ref}.cost_impact, 0) "
+                f"WHERE ws_id = {ref}.ws_id AND {ref}.status = 'Approved';")
+    create_trigger(cursor, 'dashboard_status_on_change_requests_insert',
+                   "AFTER INSERT ON change_requests WHEN NEW.status = 'Approved'", count_cr('NEW', '+'))
+    create_trigger(cursor, 'dashboard_status_on_change_requests_delete',
+                   "AFTER DELETE ON change_requests WHEN OLD.status = 'Approved'", count_cr('OLD', '-'))
+    create_trigger(cursor, 'dashboard_status_on_change_requests_update',
+                   "AFTER UPDATE ON change_requests WHEN OLD.status = 'Approved' OR NEW.status = 'Approved'",
+                   count_cr('OLD', '-') + count_cr('NEW', '+'))
+    print("✔ Built Dashboard Roll-ups")
 
 # --- Execution ---
 if __name__ == '__main__':
-    # Remove old DB if exists to start fresh
-    if os.path.exists(DB_NAME):
-        os.remove(DB_NAME)
+    # Remove old DB (and any leftover WAL files) if exists to start fresh
+    for path in (DB_NAME, DB_NAME + '-wal', DB_NAME + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
         
     conn = sqlite3.connect(DB_NAME)
+    # Bulk-load tuning: WAL + NORMAL sync avoids an fsync per statement group,
+    # and lets the dashboard keep reading while the generator writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB
     cursor = conn.cursor()
     
-    create_schema(cursor)
-    generate_data(cursor)
+    # Everything goes in as a single transaction, committed on success. The explicit
+    # BEGIN matters: sqlite3 would otherwise autocommit the schema DDL and only open
+    # its implicit transaction at the first INSERT
+    with conn:
+        cursor.execute("BEGIN")
+        create_schema(cursor)
+        generate_data(cursor)
+        build_rollups(cursor)
+        # Gather table statistics so the query planner picks the indexes above
+        cursor.execute("ANALYZE")
     
-    conn.commit()
     conn.close()
     print(f"\nSUCCESS: Database '{DB_NAME}' created.")
\ No newline at end of file
@@ -0,0 +1,16 @@
+# Production server settings, picked up automatically when run from this directory:
+#   python data.generator.py   (first time only, if sap_project.db is missing)
+#   gunicorn app:app
+# (app.run(debug=True) in app.py is the single-process development server)
+
+bind = "127.0.0.1:8000"
+
+# Several worker processes serve dashboard requests in parallel. The generator
+# leaves the DB in WAL mode, so their SQLite readers don't block each other.
+workers = 4
+
+# Threaded workers rather than gevent: sqlite3 calls can't yield to other greenlets,
+# but they do release the GIL, and app.py keeps one connection per thread so every
+# thread reuses its connection (and its cached statements) across requests
+worker_class = "gthread"
+threads = 4